@@ -1,79 +1,157 @@
 # app.py
+import csv
+import functools
+import io
+import os
+import re
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
+
+# matplotlib (Figure only, no pyplot) and seaborn are imported lazily inside
+# the Upload tab's chart block: they are only needed there, and keeping them
+# off the module path shaves their import cost from first render of the
+# other tabs
+
+from scoring_numba import NUMBA_AVAILABLE as _NUMBA_AVAILABLE
+from scoring_numba import score_kernel as _score_kernel
+from scoring_numba import warmup as _numba_warmup
+
+# Pay the JIT compile (or disk-cache load) once at startup, not on the
+# first large upload
+_numba_warmup()
 
 st.set_page_config(page_title="Risk & Typology Scoring Demo", layout="wide")
 st.title("🔎 Risk & Typology Scoring")
 st.markdown("Use sample dataset, upload CSV, or enter transaction manually. Demo uses dummy data only.")
 
 # ---------------- Country Risk ----------------
-HIGH_RISK_COUNTRIES = {"Afghanistan", "North Korea", "Iran", "Syria", "Russia"}
-MEDIUM_RISK_COUNTRIES = {"Pakistan", "Yemen", "Iraq", "Libya"}
+HIGH_RISK_COUNTRIES = frozenset({"Afghanistan", "North Korea", "Iran", "Syria", "Russia"})
+MEDIUM_RISK_COUNTRIES = frozenset({"Pakistan", "Yemen", "Iraq", "Libya"})
 
 MAJOR_COUNTRIES = [
     "India","USA","UK","Singapore","Germany","France","China","Russia","Afghanistan",
     "North Korea","Iran","Syria","Pakistan","Brazil","Canada","Australia","South Africa","Japan"
 ]
 
+# O(1) index lookups for selectbox defaults instead of list.index scans
+_MAJOR_IDX = {c: i for i, c in enumerate(MAJOR_COUNTRIES)}
+
+# Fixed country universe for batch scoring: encode country columns to int
+# codes once, then risk membership is a gather into these boolean tables
+# instead of a hash probe per row
+# country -> risk tier (2 high, 1 medium, absent = 0) with a score per tier;
+# one dict probe per country instead of up to two set probes each
+COUNTRY_TIER = {c: 2 for c in HIGH_RISK_COUNTRIES} | {c: 1 for c in MEDIUM_RISK_COUNTRIES}
+_COUNTRY_SCORE = (0, 20, 50)
+
+COUNTRY_UNIVERSE = tuple(sorted(HIGH_RISK_COUNTRIES | MEDIUM_RISK_COUNTRIES | set(MAJOR_COUNTRIES)))
+_HIGH_MASK = np.array([c in HIGH_RISK_COUNTRIES for c in COUNTRY_UNIVERSE])
+_MED_MASK = np.array([c in MEDIUM_RISK_COUNTRIES for c in COUNTRY_UNIVERSE])
+
+# Typology labels in bit order for the batch scorer's typology_mask column
+TYPOLOGY_LABELS = ("Layering / Cross-border structuring",
+                   "Cross-border retail remittance / funnel account",
+                   "Crypto transaction",
+                   "Trade-based money laundering")
+
+# All 16 possible pipe-joined typology strings, rendered once at import;
+# the batch scorer gathers rows through this table instead of joining
+# strings per row
+_TYPOLOGY_STRINGS = np.array(
+    ["|".join(l for i, l in enumerate(TYPOLOGY_LABELS) if m >> i & 1)
+     or "No clear typology detected" for m in range(16)], dtype=object)
+
 # ---------------- Typology & OFAC example lists ----------------
-HIGH_RISK_PURPOSES = [
+HIGH_RISK_PURPOSES = (
     "Hawala transfer", "Cryptocurrency exchange", "High-value cash",
     "Suspicious payment", "Trade-based money laundering"
-]
+)
+
+# One compiled alternation scans the purpose in a single pass instead of
+# one substring search per keyword. st.cache_resource keeps the compiled
+# pattern process-global: Streamlit re-executes this script on every rerun,
+# and cache_resource shares one object across all sessions without copying.
+@st.cache_resource
+def _purpose_pattern():
+    return re.compile("|".join(re.escape(p.lower()) for p in HIGH_RISK_PURPOSES))
+
+_PURPOSE_RE = _purpose_pattern()
+
+# Amount thresholds (high, medium) indexed by
+# [remitter_is_company][beneficiary_is_company] — a two-step tuple index
+# instead of building and hashing an "individual-company" key string per call
+_THRESH_BY_TYPE = (((10000, 5000), (15000, 7000)),
+                   ((20000, 10000), (50000, 20000)))
+
+# Same thresholds as flat lookup tables in integer cents, indexed by
+# remitter_is_company * 2 + beneficiary_is_company for the batch path
+_HIGH_LUT_CENTS = np.array([10000, 15000, 20000, 50000], dtype=np.int64) * 100
+_MED_LUT_CENTS = np.array([5000, 7000, 10000, 20000], dtype=np.int64) * 100
+
+# One bit per rule; the explanation is assembled from the fired bits in a
+# single pass instead of growing a per-call reasons list
+R_COUNTRY_HIGH, R_COUNTRY_MED, R_AMOUNT_HIGH, R_AMOUNT_MED, R_PURPOSE, R_XBORDER = (
+    1, 2, 4, 8, 16, 32)
+_REASON_TEMPLATES = (
+    (R_COUNTRY_HIGH, "High-risk / sanctioned country: {sender} -> {receiver}"),
+    (R_COUNTRY_MED, "Medium-risk country: {sender} -> {receiver}"),
+    (R_AMOUNT_HIGH, "High amount (above {high_thresh} USD) for {remitter_type} → {beneficiary_type}"),
+    (R_AMOUNT_MED, "Medium amount (above {med_thresh} USD) for {remitter_type} → {beneficiary_type}"),
+    (R_PURPOSE, "High-risk purpose detected: {purpose}"),
+    (R_XBORDER, "Cross-border transaction"),
+)
 
 # ---------------- Risk calculation ----------------
-def compute_risk_and_typology(tx):
+@functools.lru_cache(maxsize=4096)
+def _score_core(sender, receiver, amount_band, purpose, remitter_type, beneficiary_type):
+    """Pure scoring core over hashable primitives; memoized so identical
+    transactions (re-selected IDs, repeated button clicks) skip the rule chain.
+
+    amount_band is the pre-bucketed amount (0 below medium, 1 above medium,
+    2 above high threshold): rule-equivalent amounts share a cache entry."""
     risk_points = 0
-    reasons = []
+    reason_mask = 0
 
-    sender = tx.get("remitter_country","").strip()
-    receiver = tx.get("beneficiary_country","").strip()
-    amount = float(tx.get("amount_usd") or 0)
-    purpose = tx.get("purpose","").strip().lower()
-    remitter_type = tx.get("account_type","Individual").lower()
-    beneficiary_type = tx.get("beneficiary_account_type","Individual").lower()
+    # Evaluate each membership / comparison once and reuse below
+    sender_tier = COUNTRY_TIER.get(sender, 0)
+    tier = max(sender_tier, COUNTRY_TIER.get(receiver, 0))
+    hr_sender = sender_tier == 2
+    cross_border = sender != receiver
 
     # Country risk
-    country_score = 0
-    if sender in HIGH_RISK_COUNTRIES or receiver in HIGH_RISK_COUNTRIES:
-        country_score = 50
-        reasons.append(f"High-risk / sanctioned country: {sender} -> {receiver}")
-    elif sender in MEDIUM_RISK_COUNTRIES or receiver in MEDIUM_RISK_COUNTRIES:
-        country_score = 20
-        reasons.append(f"Medium-risk country: {sender} -> {receiver}")
+    country_score = _COUNTRY_SCORE[tier]
+    if tier == 2:
+        reason_mask |= R_COUNTRY_HIGH
+    elif tier == 1:
+        reason_mask |= R_COUNTRY_MED
     risk_points += country_score
 
     # Amount risk logic based on account types
     amount_score = 0
-    thresholds = {"individual-individual": (10000, 5000),
-                  "individual-company": (15000, 7000),
-                  "company-individual": (20000, 10000),
-                  "company-company": (50000, 20000)}
-    key = f"{remitter_type}-{beneficiary_type}"
-    high_thresh, med_thresh = thresholds.get(key, (10000, 5000))
-
-    if amount > high_thresh:
+    high_thresh, med_thresh = _THRESH_BY_TYPE[remitter_type == "company"][beneficiary_type == "company"]
+
+    if amount_band == 2:
         amount_score = 20
-        reasons.append(f"High amount ({amount} USD) for {remitter_type} → {beneficiary_type}")
-    elif amount > med_thresh:
+        reason_mask |= R_AMOUNT_HIGH
+    elif amount_band == 1:
         amount_score = 10
-        reasons.append(f"Medium amount ({amount} USD) for {remitter_type} → {beneficiary_type}")
+        reason_mask |= R_AMOUNT_MED
     risk_points += amount_score
 
     # Purpose risk
     purpose_score = 0
-    if any(hrp.lower() in purpose for hrp in HIGH_RISK_PURPOSES):
+    if _PURPOSE_RE.search(purpose):
         purpose_score = 20
-        reasons.append(f"High-risk purpose detected: {purpose}")
+        reason_mask |= R_PURPOSE
     risk_points += purpose_score
 
     # Cross-border
     cross_border_score = 0
-    if sender != receiver:
+    if cross_border:
         cross_border_score = 10
-        reasons.append("Cross-border transaction")
+        reason_mask |= R_XBORDER
     risk_points += cross_border_score
 
     # Final score
@@ -85,50 +163,255 @@ def compute_risk_and_typology(tx):
     else:
         level, emoji = "High", "🔴"
 
-    # Typologies
-    typologies = []
-    if amount > high_thresh and sender in HIGH_RISK_COUNTRIES:
-        typologies.append("Layering / Cross-border structuring")
-    if amount > med_thresh and sender != receiver and remitter_type=="individual":
-        typologies.append("Cross-border retail remittance / funnel account")
+    # Typologies — same bit layout as the batch scorer's typology_mask
+    typ_mask = 0
+    if amount_band == 2 and hr_sender:
+        typ_mask |= 1
+    if amount_band >= 1 and cross_border and remitter_type=="individual":
+        typ_mask |= 2
     if "crypto" in purpose:
-        typologies.append("Crypto transaction")
+        typ_mask |= 4
     if "trade" in purpose:
-        typologies.append("Trade-based money laundering")
-    if not typologies:
-        typologies.append("No clear typology detected")
+        typ_mask |= 8
+    typologies = tuple(l for i, l in enumerate(TYPOLOGY_LABELS) if typ_mask >> i & 1) \
+        or ("No clear typology detected",)
+
+    if reason_mask:
+        explanation = "; ".join(
+            tmpl.format(sender=sender, receiver=receiver,
+                        high_thresh=high_thresh, med_thresh=med_thresh,
+                        remitter_type=remitter_type, beneficiary_type=beneficiary_type,
+                        purpose=purpose)
+            for bit, tmpl in _REASON_TEMPLATES if reason_mask & bit)
+    else:
+        explanation = "No strong drivers detected by demo rules."
 
-    explanation = "; ".join(reasons) if reasons else "No strong drivers detected by demo rules."
+    return (score, level, emoji, typologies, typ_mask, explanation,
+            (country_score, amount_score, purpose_score, cross_border_score))
 
+def compute_risk_and_typology(tx):
+    remitter_type = tx.get("account_type", "Individual").lower()
+    beneficiary_type = tx.get("beneficiary_account_type", "Individual").lower()
+    amount = float(tx.get("amount_usd") or 0)
+    high_thresh, med_thresh = _THRESH_BY_TYPE[remitter_type == "company"][beneficiary_type == "company"]
+    amount_band = 2 if amount > high_thresh else 1 if amount > med_thresh else 0
+    score, level, emoji, typologies, typ_mask, explanation, sub = _score_core(
+        tx.get("remitter_country", "").strip(),
+        tx.get("beneficiary_country", "").strip(),
+        amount_band,
+        tx.get("purpose", "").strip().lower(),
+        remitter_type,
+        beneficiary_type
+    )
     return {
         "score": score,
         "level": level,
         "emoji": emoji,
-        "typologies": typologies,
+        "typologies": list(typologies),
+        "typology_mask": typ_mask,
         "explanation": explanation,
         "sub_scores": {
-            "country": country_score,
-            "amount": amount_score,
-            "purpose": purpose_score,
-            "cross_border": cross_border_score
+            "country": sub[0],
+            "amount": sub[1],
+            "purpose": sub[2],
+            "cross_border": sub[3]
         }
     }
 
+# ---------------- Vectorized batch scoring ----------------
+# Below this row count the NumPy path wins; JIT dispatch isn't worth it
+_NUMBA_MIN_ROWS = 10_000
+
+@st.cache_data(show_spinner=False)
+def score_dataframe(df):
+    """Score every transaction in one vectorized pass (no per-row apply)."""
+    # Integer cents: amount comparisons become pure int compares and the
+    # scoring arrays stop paying for float64 semantics. Round, don't
+    # truncate: 20000.01 * 100 is 2000000.99... in float64, and truncation
+    # would drop amounts a cent above a threshold onto the wrong side
+    amt_cents = np.round(pd.to_numeric(df["amount_usd"], errors="coerce").fillna(0)
+                         .to_numpy(np.float64) * 100).astype(np.int64)
+    # Values are stripped at load/parse time; only the dtype cast remains here
+    snd = df["remitter_country"].astype(str).to_numpy()
+    rcv = df["beneficiary_country"].astype(str).to_numpy()
+    rtype = df.get("account_type", pd.Series("Individual", index=df.index)).astype(str).str.lower()
+    btype = df.get("beneficiary_account_type", pd.Series("Individual", index=df.index)).astype(str).str.lower()
+    purpose = df["purpose"].astype(str).str.lower()
+
+    # Country risk — gather through the precomputed membership tables;
+    # unknown countries encode to -1 and are masked out
+    snd_codes = pd.Categorical(snd, categories=COUNTRY_UNIVERSE).codes
+    rcv_codes = pd.Categorical(rcv, categories=COUNTRY_UNIVERSE).codes
+    hr_snd = np.where(snd_codes >= 0, _HIGH_MASK[snd_codes], False)
+
+    # Amount risk — resolve thresholds per account-type pair, then compare whole columns
+    # Account types collapse to one bit each; thresholds come from a 4-entry
+    # gather instead of string concatenation plus dict lookups per row.
+    # Unknown types fall on the individual bit, matching the scalar default.
+    pair_idx = ((rtype == "company").to_numpy(np.uint8) * 2
+                + (btype == "company").to_numpy(np.uint8))
+    high_thresh = _HIGH_LUT_CENTS[pair_idx]
+    med_thresh = _MED_LUT_CENTS[pair_idx]
+
+    # Purpose risk — one regex scan per row instead of K substring scans
+    purpose_hit = purpose.str.contains(_PURPOSE_RE, regex=True).fillna(False).to_numpy()
+
+    # Cross-border
+    cross = snd != rcv
+
+    if _NUMBA_AVAILABLE and len(df) > _NUMBA_MIN_ROWS:
+        # The kernel resolves country membership from the codes itself, so
+        # the intermediate hr/med arrays are never materialized
+        score = _score_kernel(amt_cents, snd_codes, rcv_codes, _HIGH_MASK, _MED_MASK,
+                              purpose_hit, cross, high_thresh, med_thresh)
+    else:
+        hr = hr_snd | np.where(rcv_codes >= 0, _HIGH_MASK[rcv_codes], False)
+        med = ~hr & (np.where(snd_codes >= 0, _MED_MASK[snd_codes], False)
+                     | np.where(rcv_codes >= 0, _MED_MASK[rcv_codes], False))
+        country_pts = 50 * hr + 20 * med
+        amount_pts = np.where(amt_cents > high_thresh, 20, np.where(amt_cents > med_thresh, 10, 0))
+        score = np.minimum(country_pts + amount_pts + 20 * purpose_hit + 10 * cross, 100)
+    # Categorical level column: one cut over the score array, and downstream
+    # value_counts/sorts work on int8 codes rather than Python strings
+    level = pd.cut(score, bins=[-1, 29, 59, 101], labels=["Low", "Medium", "High"])
+
+    # Typologies — same rules as compute_risk_and_typology, evaluated as masks
+    # and packed into one uint8 bitmask per row (bit i = TYPOLOGY_LABELS[i]);
+    # the display strings are a gather into the precomputed 16-entry table
+    t_layering = (amt_cents > high_thresh) & hr_snd
+    t_funnel = (amt_cents > med_thresh) & cross & (rtype == "individual").to_numpy()
+    t_crypto = purpose.str.contains("crypto").fillna(False).to_numpy()
+    t_trade = purpose.str.contains("trade").fillna(False).to_numpy()
+    typ_mask = (t_layering * 1 + t_funnel * 2 + t_crypto * 4 + t_trade * 8).astype(np.uint8)
+    typologies = _TYPOLOGY_STRINGS[typ_mask]
+
+    return df.assign(risk_score=score.astype(np.int8), risk_level=level,
+                     typologies=typologies, typology_mask=typ_mask)
+
 # ---------------- Load sample ----------------
-@st.cache_data
-def load_sample(path="transactions.csv"):
-    try:
-        df = pd.read_csv(path, dtype=str)
-        df.columns = df.columns.str.strip()
-        if "tx_id" not in df.columns:
-            df.insert(0, "tx_id", [f"SAMPLE_{i+1}" for i in range(len(df))])
-        return df
-    except:
-        return pd.DataFrame()
-
-df_sample = load_sample()
+@st.cache_resource(ttl=3600)
+def load_sample(path, mtime, size):
+    # mtime/size are cache-key parameters: editing the CSV busts the entry.
+    # cache_resource shares the one prepared frame across sessions without
+    # the per-rerun deep copy cache_data makes; treat the result as read-only.
+    df = pd.read_csv(path, dtype=str, engine="pyarrow")
+    df.columns = df.columns.str.strip()
+    if "tx_id" not in df.columns:
+        df.insert(0, "tx_id", [f"SAMPLE_{i+1}" for i in range(len(df))])
+    # Clean values once at load so per-transaction scoring needn't re-strip
+    for c in ("remitter_country", "beneficiary_country", "account_type", "purpose"):
+        if c in df.columns:
+            df[c] = df[c].str.strip()
+    # Low-cardinality string columns as category: codes compare as ints
+    for c in ("remitter_country", "beneficiary_country", "account_type", "purpose"):
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
+
+SAMPLE_PATH = "transactions.csv"
+try:
+    df_sample = load_sample(SAMPLE_PATH, os.path.getmtime(SAMPLE_PATH),
+                            os.path.getsize(SAMPLE_PATH))
+except Exception:
+    df_sample = pd.DataFrame()
+
+@st.cache_data(show_spinner=False)
+def _tx_lookup(df):
+    """tx_id -> plain row dict, built once per frame; selection becomes a
+    dict lookup with no pandas indexing or per-click to_dict at all."""
+    return {r["tx_id"]: r for r in df.to_dict(orient="records")}
+
+@st.cache_data(show_spinner=False)
+def parse_upload(file_bytes):
+    """Parse an uploaded CSV keyed on its content bytes, so widget ticks in
+    the Upload tab stop re-parsing an unchanged file."""
+    import pyarrow.csv as pacsv
+    table = pacsv.read_csv(io.BytesIO(file_bytes),
+                           read_options=pacsv.ReadOptions(use_threads=True))
+    df = table.to_pandas()
+    df.columns = df.columns.str.strip()
+    if "tx_id" not in df.columns:
+        df.insert(0, "tx_id", [f"UPLOAD_{i+1}" for i in range(len(df))])
+    else:
+        df["tx_id"] = df["tx_id"].astype(str)
+    if "account_type" not in df.columns:
+        df["account_type"] = "Individual"
+    if "beneficiary_account_type" not in df.columns:
+        df["beneficiary_account_type"] = "Individual"
+    # Backfill the scoring columns too, so a malformed upload degrades to a
+    # zero contribution from the missing field (as the scalar path's .get
+    # defaults do) instead of crashing the batch scorer
+    for c in ("remitter_country", "beneficiary_country", "purpose"):
+        if c not in df.columns:
+            df[c] = ""
+    if "amount_usd" not in df.columns:
+        df["amount_usd"] = 0.0
+    # Clean values once at parse time, like load_sample does, so nothing
+    # downstream re-strips per row
+    for c in ("remitter_country", "beneficiary_country", "purpose",
+              "account_type", "beneficiary_account_type"):
+        if c in df.columns:
+            df[c] = df[c].astype(str).str.strip()
+    # Typed columns: float32 amounts and category strings are a fraction of
+    # the object-dtype footprint and sort/compare as native codes
+    if "amount_usd" in df.columns:
+        df["amount_usd"] = pd.to_numeric(df["amount_usd"], errors="coerce").astype("float32")
+    for c in ("remitter_country", "beneficiary_country", "purpose",
+              "account_type", "beneficiary_account_type"):
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
+
+@st.cache_data(show_spinner=False)
+def _scored_csv_bytes(df):
+    """Encoded CSV for the full scored frame, reused across reruns.
+
+    Arrow's C CSV writer takes over once the frame is big enough for
+    serialization to matter; tiny frames keep the pandas writer, where
+    the Table conversion overhead would dominate.
+    """
+    if len(df) < 100:
+        return df.to_csv(index=False).encode("utf-8")
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    buf = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False)
+def _risk_level_counts(df_scores):
+    """High/Medium/Low histogram, derived once per scored frame."""
+    return df_scores["risk_level"].value_counts().reindex(
+        ["High", "Medium", "Low"], fill_value=0)
+
+@st.cache_data(show_spinner=False)
+def _top_typologies(df_scores):
+    """Top-5 typology counts off the bitmask column, once per scored frame."""
+    masks = df_scores["typology_mask"].to_numpy()
+    counts = {label: int(np.count_nonzero(masks & (1 << i)))
+              for i, label in enumerate(TYPOLOGY_LABELS)}
+    counts["No clear typology detected"] = int(np.count_nonzero(masks == 0))
+    return (pd.Series({k: v for k, v in counts.items() if v}, dtype="int64")
+            .sort_values(ascending=False).head(5))
+
+@st.cache_data(show_spinner=False)
+def _tx_id_options(df):
+    """Selectbox options, materialized once per frame instead of per rerun.
+    A tuple, so the cached value is immutable and cheap for the widget
+    hasher to compare on later reruns."""
+    return ("-- choose --", *df["tx_id"].tolist())
 
 # ---------------- Display helper ----------------
+@st.cache_data(show_spinner=False)
+def _single_tx_csv(row_items):
+    """CSV bytes for one scored transaction, written directly with csv.writer
+    (no single-row DataFrame detour); cached so reruns reuse the buffer."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow([k for k, _ in row_items])
+    w.writerow([v for _, v in row_items])
+    return buf.getvalue().encode("utf-8")
+
 def display_result(tx, res):
     st.markdown("## Transaction Risk Overview")
     left, right = st.columns([2,3])
@@ -144,20 +427,32 @@ def display_result(tx, res):
     with right:
         st.markdown("### Sub-scores")
         sub = res.get("sub_scores", {})
-        c1, c2 = st.columns(2)
-        c1.metric("Country Risk", sub.get("country",0))
-        c2.metric("Amount Risk", sub.get("amount",0))
-        c1, c2 = st.columns(2)
-        c1.metric("Purpose Risk", sub.get("purpose",0))
-        c2.metric("Cross-border Risk", sub.get("cross_border",0))
+        # One frame instead of four st.metric widgets: each widget is a
+        # separate websocket message and frontend rerender
+        st.dataframe(pd.DataFrame({
+            "Metric": ["Country Risk", "Amount Risk", "Purpose Risk", "Cross-border Risk"],
+            "Value": [sub.get("country", 0), sub.get("amount", 0),
+                      sub.get("purpose", 0), sub.get("cross_border", 0)],
+        }), hide_index=True, use_container_width=True)
 
     st.markdown("### Likely Typologies")
-    for t in res["typologies"]:
-        st.success(f"- {t}")
+    st.success("\n".join(f"- {t}" for t in res["typologies"]))
 
     st.markdown("### Explanation")
     st.info(res["explanation"])
 
+    row_items = tuple({**tx,
+                       "risk_score": res["score"],
+                       "risk_level": res["level"],
+                       "typologies": "|".join(res["typologies"]),
+                       "explanation": res["explanation"]}.items())
+    st.download_button(
+        "Download Scored Transaction",
+        _single_tx_csv(row_items),
+        file_name=f"{tx.get('tx_id', 'transaction')}_scored.csv",
+        mime="text/csv"
+    )
+
 # ---------------- Tabs ----------------
 tab1, tab2, tab3 = st.tabs(["Sample Dataset", "Upload CSV", "Manual Input"])
 
@@ -168,11 +463,11 @@ with tab1:
     else:
         choice_sample = st.selectbox(
             "Select Transaction ID (Sample)",
-            options=["-- choose --"] + df_sample["tx_id"].tolist(),
+            options=_tx_id_options(df_sample),
             key="sample_select"
         )
         if choice_sample != "-- choose --":
-            tx = df_sample[df_sample["tx_id"] == choice_sample].iloc[0].to_dict()
+            tx = _tx_lookup(df_sample)[choice_sample]
             if st.button("Score Transaction", key="score_sample"):
                 res = compute_risk_and_typology(tx)
                 display_result(tx, res)
@@ -181,68 +476,49 @@ with tab1:
 with tab2:
     uploaded_file = st.file_uploader("Upload your transactions CSV", type=["csv"], key="upload_csv")
     if uploaded_file:
-        df_uploaded = pd.read_csv(uploaded_file, dtype=str)
-        df_uploaded.columns = df_uploaded.columns.str.strip()
-        if "tx_id" not in df_uploaded.columns:
-            df_uploaded.insert(0, "tx_id", [f"UPLOAD_{i+1}" for i in range(len(df_uploaded))])
-        if "account_type" not in df_uploaded.columns: df_uploaded["account_type"] = "Individual"
-        if "beneficiary_account_type" not in df_uploaded.columns: df_uploaded["beneficiary_account_type"] = "Individual"
+        df_uploaded = parse_upload(uploaded_file.getvalue())
 
         st.success(f"Uploaded {len(df_uploaded)} transactions successfully!")
 
-        # Score all transactions — FIXED
-        def score_tx(row):
-            r = row.to_dict()
-            simple_tx = {
-                "remitter_country": r.get("remitter_country",""),
-                "beneficiary_country": r.get("beneficiary_country",""),
-                "amount_usd": float(r.get("amount_usd",0) or 0),
-                "purpose": r.get("purpose",""),
-                "account_type": r.get("account_type","Individual"),
-                "beneficiary_account_type": r.get("beneficiary_account_type","Individual")
-            }
-            res = compute_risk_and_typology(simple_tx)
-            return pd.Series({
-                "risk_score": res["score"],
-                "risk_level": res["level"],
-                "typologies": "|".join(res["typologies"])
-            })
-
-        df_scores = df_uploaded.join(df_uploaded.apply(score_tx, axis=1))
-        st.dataframe(df_scores.sort_values("risk_score", ascending=False).head(10))
+        # Score all transactions in one vectorized pass
+        df_scores = score_dataframe(df_uploaded)
+        # Project to the columns worth showing before sorting/serializing;
+        # Streamlit Arrow-encodes everything it is handed
+        cols_to_show = [c for c in ("tx_id", "remitter_country", "beneficiary_country",
+                                    "amount_usd", "purpose", "risk_score", "risk_level",
+                                    "typologies") if c in df_scores.columns]
+        view = df_scores[cols_to_show].nlargest(10, "risk_score")
+        st.dataframe(view, use_container_width=True, hide_index=True)
 
         # Pick one transaction to show detailed scoring
         choice_upload = st.selectbox(
             "Select Transaction ID from uploaded CSV to view detailed score",
-            options=["-- choose --"] + df_scores["tx_id"].tolist(),
+            options=_tx_id_options(df_scores),
             key="upload_select"
         )
         if choice_upload != "-- choose --":
-            tx = df_uploaded[df_uploaded["tx_id"] == choice_upload].iloc[0].to_dict()
+            tx = _tx_lookup(df_uploaded)[choice_upload]
             res = compute_risk_and_typology(tx)
             display_result(tx, res)
 
         # ---- Polished Charts ----
+        # Plain Figure objects (no pyplot): nothing lands in pyplot's global
+        # figure registry, so figures are garbage-collected after rendering
+        # instead of leaking across reruns
+        from matplotlib.figure import Figure
+        import seaborn as sns
+
         st.markdown("## 📊 Visual Analytics")
 
-        # 1️⃣ Risk Level Distribution
+        # 1️⃣ Risk Level Distribution — three bars need no Agg rendering;
+        # st.bar_chart draws client-side via Vega-Lite
         st.markdown("### Risk Level Distribution")
-        risk_counts = df_scores["risk_level"].value_counts().reindex(["High","Medium","Low"], fill_value=0)
-        fig_risk, ax_risk = plt.subplots(figsize=(6,4))
-        bars = ax_risk.bar(risk_counts.index, risk_counts.values, color=["red","orange","green"])
-        ax_risk.set_ylabel("Number of Transactions")
-        ax_risk.set_xlabel("Risk Level")
-        ax_risk.set_title("Distribution of Risk Levels")
-        for bar in bars:
-            height = bar.get_height()
-            ax_risk.annotate(f'{int(height)}', xy=(bar.get_x()+bar.get_width()/2, height),
-                             xytext=(0,3), textcoords="offset points",
-                             ha='center', va='bottom')
-        st.pyplot(fig_risk)
+        st.bar_chart(_risk_level_counts(df_scores))
 
         # 2️⃣ Amount Distribution
         st.markdown("### Amount Distribution (USD)")
-        fig_amount, ax_amount = plt.subplots(figsize=(6,4))
+        fig_amount = Figure(figsize=(6,4))
+        ax_amount = fig_amount.add_subplot(111)
         ax_amount.hist(df_scores["amount_usd"].astype(float), bins=15, color='skyblue', edgecolor='black')
         ax_amount.set_xlabel("Amount (USD)")
         ax_amount.set_ylabel("Frequency")
@@ -252,24 +528,24 @@ with tab2:
         # 3️⃣ Origin vs Destination Heatmap
         st.markdown("### Origin vs Destination (Cross-border Matrix)")
         cross_tab = pd.crosstab(df_scores["remitter_country"], df_scores["beneficiary_country"])
-        fig_heat, ax_heat = plt.subplots(figsize=(10,6))
+        fig_heat = Figure(figsize=(10,6))
+        ax_heat = fig_heat.add_subplot(111)
         sns.heatmap(cross_tab, cmap="Blues", annot=True, fmt="d",
                     linewidths=.5, cbar_kws={'label': 'Number of Transactions'}, ax=ax_heat)
         ax_heat.set_title("Number of Transactions by Origin vs Destination")
         ax_heat.set_xlabel("Beneficiary Country")
         ax_heat.set_ylabel("Remitter Country")
-        plt.xticks(rotation=45, ha='right')
+        ax_heat.set_xticklabels(ax_heat.get_xticklabels(), rotation=45, ha='right')
         st.pyplot(fig_heat)
 
-        # 4️⃣ Top Typologies Table
+        # 4️⃣ Top Typologies Table — counted straight off the bitmask column,
+        # no string split/explode round-trip
         st.markdown("### Top Typologies")
-        typology_series = df_scores["typologies"].str.split("|").explode()
-        top_typologies = typology_series.value_counts().head(5)
-        st.table(top_typologies)
+        st.table(_top_typologies(df_scores))
 
         st.download_button(
             "Download Full Scored CSV",
-            df_scores.to_csv(index=False).encode("utf-8"),
+            _scored_csv_bytes(df_scores),
             file_name="scored_transactions.csv",
             mime="text/csv"
         )
@@ -282,7 +558,7 @@ with tab3:
         with r1:
             remitter_name = st.text_input("Name", "John Doe")
             remitter_address = st.text_input("Address", "123 Main Street")
-            remitter_country = st.selectbox("Country", MAJOR_COUNTRIES, index=MAJOR_COUNTRIES.index("India"))
+            remitter_country = st.selectbox("Country", MAJOR_COUNTRIES, index=_MAJOR_IDX["India"])
         with r2:
             purpose = st.text_input("Purpose of Transfer", "Family Support")
             amount_usd = st.number_input("Amount (USD)", min_value=0.0, value=5000.0, step=100.0)
@@ -294,7 +570,7 @@ with tab3:
             beneficiary_name = st.text_input("Name", "Jane Doe")
             beneficiary_address = st.text_input("Address", "456 Elm Street")
         with b2:
-            beneficiary_country = st.selectbox("Country", MAJOR_COUNTRIES, index=MAJOR_COUNTRIES.index("USA"))
+            beneficiary_country = st.selectbox("Country", MAJOR_COUNTRIES, index=_MAJOR_IDX["USA"])
             beneficiary_account_type = st.selectbox("Beneficiary Account Type", ["Individual","Company"], index=0)
 
         submitted = st.form_submit_button("Score Transaction")
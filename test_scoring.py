@@ -0,0 +1,41 @@
+# test_scoring.py
+"""Boundary checks: the vectorized batch scorer must agree with the scalar
+rules for amounts a cent either side of the account-type thresholds,
+including after parse_upload's float32 downcast."""
+import pandas as pd
+import pytest
+
+from app import compute_risk_and_typology, score_dataframe
+
+
+def _tx(amount, rtype, btype):
+    return {
+        "tx_id": "TX_BOUNDARY",
+        "remitter_country": "India",
+        "beneficiary_country": "India",
+        "purpose": "Family Support",
+        "amount_usd": amount,
+        "account_type": rtype,
+        "beneficiary_account_type": btype,
+    }
+
+
+@pytest.mark.parametrize("amount,rtype,btype", [
+    (10000.01, "Individual", "Individual"),
+    (15000.01, "Individual", "Company"),
+    (20000.01, "Company", "Individual"),
+    (50000.01, "Company", "Company"),
+    (5000.01, "Individual", "Individual"),
+    (10000.00, "Individual", "Individual"),
+    (20000.00, "Company", "Individual"),
+    (50000.00, "Company", "Company"),
+])
+def test_amount_boundaries_match_scalar(amount, rtype, btype):
+    tx = _tx(amount, rtype, btype)
+    scalar = compute_risk_and_typology(tx)
+    df = pd.DataFrame([tx])
+    # parse_upload stores amounts as float32; the batch path must still agree
+    df["amount_usd"] = df["amount_usd"].astype("float32")
+    scored = score_dataframe(df)
+    assert int(scored["risk_score"].iloc[0]) == scalar["score"]
+    assert str(scored["risk_level"].iloc[0]) == scalar["level"]